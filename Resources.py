@@ -1,3 +1,4 @@
+"""
 # Growth (Trend)
 **What it is:** The underlying trend or direction of your data over time.  
 **Options:**
@@ -42,19 +43,191 @@
 - **Horizon:** How far into the future you want to predict.
 - **Period:** Defines how often new forecasts should be made within a time period.
 - **Uncertainty interval:** The range of uncertainty around the predictions, which provides a confidence range.
+"""
 
+import os
+import warnings
+from collections import OrderedDict
+from functools import partial
 
+# Compiler settings picked up by CmdStan when it builds the Stan model. They must be set
+# before Prophet loads its backend; values already in the environment take precedence.
+os.environ.setdefault('CXXFLAGS', '-O3 -march=native -funroll-loops')
+os.environ.setdefault('STAN_THREADS', 'true')
 
+# Threads one Stan run may use to evaluate the likelihood in parallel (reduce_sum in
+# stan/prophet.stan). A MAP fit uses all of them; MCMC splits them across its parallel chains.
+os.environ.setdefault('STAN_NUM_THREADS', '4')
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-  # Import necessary libraries
-from fbprophet import Prophet
-import pandas as pd
+import numpy as np
+
+# prophet, pandas and numba are imported inside the functions that use them,
+# so importing this module stays fast (e.g. on serverless cold starts)
+
+# Stan backend shared by every model, so the Stan model is only loaded once per process
+_STAN_BACKEND = None
+
+# Function to get the shared Stan backend
+def _get_stan_backend():
+    """
+    Load the forked Stan model on first use and return the shared backend.
+    
+    If the fork can't be compiled (e.g. no CmdStan installation to build it with),
+    this warns once and models keep Prophet's packaged Stan model instead.
+    
+    Returns:
+    - The shared GLMStanBackend instance, or None if the forked model is unavailable.
+    """
+    global _STAN_BACKEND
+    if _STAN_BACKEND is None:
+        from stan_backend import GLMStanBackend
+        try:
+            _STAN_BACKEND = GLMStanBackend()
+        except Exception as error:
+            warnings.warn("Could not compile stan/prophet.stan, using Prophet's packaged "
+                          "Stan model instead: {}".format(error))
+            _STAN_BACKEND = False
+    return _STAN_BACKEND or None
+
+# Country holiday tables already built, keyed by (country, years)
+_HOLIDAYS_CACHE = {}
+
+# Function to get a country's holidays for the given years
+def _get_holidays(country, years):
+    """
+    Build a country's holiday table once and reuse it for every model.
+    
+    Parameters:
+    - country: Country name or code understood by the holidays package (e.g. 'US').
+    - years: Iterable of years the table must cover.
+    
+    Returns:
+    - A DataFrame with 'ds' and 'holiday' columns.
+    """
+    from prophet.make_holidays import make_holidays_df
+    
+    key = (country, tuple(years))
+    if key not in _HOLIDAYS_CACHE:
+        _HOLIDAYS_CACHE[key] = make_holidays_df(year_list=list(key[1]), country=country)
+    return _HOLIDAYS_CACHE[key]
+
+# Kernel that fills the Fourier seasonality features (compiled by _fourier_kernel)
+def _fourier_features(days, period, series_order):
+    """
+    Compute Fourier seasonality features from times expressed in days.
+    
+    Parameters:
+    - days: Float array of days since the Unix epoch.
+    - period: Period of the seasonality in days.
+    - series_order: Number of Fourier terms.
+    
+    Returns:
+    - A float32 array of shape (len(days), 2 * series_order) with sin/cos pairs for each term.
+    """
+    # Phases are computed in float64 (days since 1970 need the precision); the bounded
+    # sin/cos values are stored as float32 to halve the size of the feature matrix
+    features = np.empty((days.shape[0], 2 * series_order), dtype=np.float32)
+    for i in range(series_order):
+        x = 2.0 * np.pi * (i + 1) * days / period
+        features[:, 2 * i] = np.sin(x)
+        features[:, 2 * i + 1] = np.cos(x)
+    return features
+
+# Compiled Fourier kernel, built on first use
+_FOURIER_KERNEL = None
+
+# Function to compute Fourier features with the compiled kernel
+def _fourier_kernel(days, period, series_order):
+    """
+    Compute Fourier seasonality features with _fourier_features compiled by Numba.
+    
+    Parameters:
+    - days: Float array of days since the Unix epoch.
+    - period: Period of the seasonality in days.
+    - series_order: Number of Fourier terms.
+    
+    Returns:
+    - The array returned by _fourier_features.
+    """
+    global _FOURIER_KERNEL
+    if _FOURIER_KERNEL is None:
+        try:
+            from numba import njit
+            _FOURIER_KERNEL = njit(cache=True, fastmath=True)(_fourier_features)
+        except ImportError:  # Numba is optional; the kernel also runs as plain NumPy
+            _FOURIER_KERNEL = _fourier_features
+    return _FOURIER_KERNEL(days, period, series_order)
+
+# Function to convert dates to days since the Unix epoch
+def _dates_to_days(dates):
+    """
+    Convert dates to float days since the Unix epoch.
+    
+    Parameters:
+    - dates: Series or array of datetime64 values.
+    
+    Returns:
+    - A float array of days since 1970-01-01.
+    """
+    nanoseconds = np.asarray(dates, dtype='datetime64[ns]').astype(np.int64)
+    return nanoseconds / (24 * 3600 * 1e9)
+
+# (days, features) blocks already computed, keyed by period, order and dates, and their total size
+# in bytes (least recently used evicted first once the size exceeds the budget)
+_SEASONALITY_CACHE = OrderedDict()
+_SEASONALITY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_SEASONALITY_CACHE_NBYTES = 0
+
+# Drop-in replacement for Prophet.fourier_series
+def _fourier_series(dates, period, series_order):
+    """
+    Compute Fourier seasonality features with the compiled kernel.
+    
+    Results are memoized on the period, order and dates, so refitting the same
+    series (e.g. while tuning prior scales) reuses the blocks of the previous fit.
+    The cache holds at most _SEASONALITY_CACHE_MAX_BYTES of dates and features.
+    
+    Parameters:
+    - dates: Series of dates.
+    - period: Period of the seasonality in days.
+    - series_order: Number of Fourier terms.
+    
+    Returns:
+    - An array with the same layout as Prophet.fourier_series.
+    """
+    global _SEASONALITY_CACHE_NBYTES
+    days = _dates_to_days(dates)
+    key = (float(period), int(series_order), len(days), hash(days.tobytes()))
+    
+    # The key only hashes the dates, so a hit must also match them exactly
+    cached = _SEASONALITY_CACHE.get(key)
+    if cached is not None and np.array_equal(cached[0], days):
+        _SEASONALITY_CACHE.move_to_end(key)
+        features = cached[1]
+    else:
+        features = _fourier_kernel(days, key[0], key[1])
+        nbytes = days.nbytes + features.nbytes
+        # Blocks larger than the whole budget are returned without being cached
+        if nbytes <= _SEASONALITY_CACHE_MAX_BYTES:
+            if cached is not None:
+                del _SEASONALITY_CACHE[key]
+                _SEASONALITY_CACHE_NBYTES -= cached[0].nbytes + cached[1].nbytes
+            _SEASONALITY_CACHE[key] = (days, features)
+            _SEASONALITY_CACHE_NBYTES += nbytes
+            while _SEASONALITY_CACHE_NBYTES > _SEASONALITY_CACHE_MAX_BYTES:
+                _, (evicted_days, evicted) = _SEASONALITY_CACHE.popitem(last=False)
+                _SEASONALITY_CACHE_NBYTES -= evicted_days.nbytes + evicted.nbytes
+    
+    # Prophet zeroes rows of conditional seasonalities in place, so never hand out the cached block
+    return features.copy()
 
 # Function to create and configure a Prophet model
 def create_prophet_model(growth='linear', changepoint_range=0.8, yearly_seasonality='auto', 
                          weekly_seasonality='auto', daily_seasonality=False, 
-                         seasonality_mode='additive', n_changepoints=25):
+                         seasonality_mode='additive', n_changepoints=25, mcmc_samples=0,
+                         country=None, holiday_years=None, changepoints=None, stan_backend='GLM'):
     """
     Create and configure a Prophet model with specified parameters.
     
@@ -66,24 +239,101 @@ def create_prophet_model(growth='linear', changepoint_range=0.8, yearly_seasonal
     - daily_seasonality: Whether to include daily seasonality (True or False).
     - seasonality_mode: 'additive' or 'multiplicative' seasonality.
     - n_changepoints: Number of potential changepoints to include.
+    - mcmc_samples: Number of MCMC samples for full Bayesian inference (0 uses MAP estimation).
+    - country: Optional country whose holidays are added to the model (e.g. 'US').
+    - holiday_years: Years the country holidays must cover (history and forecast horizon).
+      If None, Prophet builds the country holidays itself on every fit.
+    - changepoints: Optional list of changepoint dates (e.g. from detect_changepoints); overrides n_changepoints.
+    - stan_backend: 'GLM' for the forked Stan model in stan/ (falling back to Prophet's packaged
+      model if it can't be compiled), or a Prophet backend name such as 'CMDSTANPY'.
+      Prophet always builds its own backend when the model is constructed; with 'GLM'
+      it is then replaced by the shared one, so the packaged model must be installed.
     
     Returns:
     - A configured Prophet model.
     """
+    from prophet import Prophet
+    
+    holidays = None
+    if country is not None and holiday_years is not None:
+        holidays = _get_holidays(country, holiday_years)
+    
     model = Prophet(growth=growth,
                     changepoint_range=changepoint_range,
                     yearly_seasonality=yearly_seasonality,
                     weekly_seasonality=weekly_seasonality,
                     daily_seasonality=daily_seasonality,
                     seasonality_mode=seasonality_mode,
-                    n_changepoints=n_changepoints)
+                    n_changepoints=n_changepoints,
+                    changepoints=changepoints,
+                    mcmc_samples=mcmc_samples,
+                    holidays=holidays,
+                    stan_backend='CMDSTANPY' if stan_backend == 'GLM' else stan_backend)
+    
+    # Fit with the forked Stan model (normal_id_glm likelihood) instead of the packaged one
+    backend = _get_stan_backend() if stan_backend == 'GLM' else None
+    if backend is not None:
+        model.stan_backend = backend
+    
+    # Without the years to cover, Prophet builds the country holidays from the history at fit time
+    if country is not None and holiday_years is None:
+        model.add_country_holidays(country_name=country)
+    
+    # Build seasonality features with the compiled Fourier kernel during fit and predict
+    Prophet.fourier_series = staticmethod(_fourier_series)
+    
+    # Draw all uncertainty samples at once when predicting intervals
+    global _PROPHET_SAMPLE_POSTERIOR_PREDICTIVE
+    if _PROPHET_SAMPLE_POSTERIOR_PREDICTIVE is None:
+        _PROPHET_SAMPLE_POSTERIOR_PREDICTIVE = Prophet.sample_posterior_predictive
+        Prophet.sample_posterior_predictive = _sample_posterior_predictive
     
     return model
 
+# Function to propose trend changepoints with PELT
+def detect_changepoints(df, changepoint_range=0.8, penalty=None):
+    """
+    Propose trend changepoints with the PELT change-point search (requires ruptures).
+    
+    Uses ruptures' KernelCPD with a linear kernel, whose cost is the same
+    squared-error (l2) cost as Pelt(model='l2') but whose search runs in
+    compiled code instead of Python.
+    
+    Passing only the detected changepoints to Prophet, instead of its uniform grid
+    of n_changepoints candidates, leaves far fewer trend parameters to fit.
+    
+    Parameters:
+    - df: DataFrame containing 'ds' (date) and 'y' (value) columns.
+    - changepoint_range: Proportion of the history in which changepoints may fall (default is 80%).
+    - penalty: PELT penalty on the standardized series (default is 15 * log(n)).
+    
+    Returns:
+    - A Series with the changepoint dates (possibly empty).
+    """
+    import pandas as pd
+    import ruptures
+    
+    # Parse the dates before sorting, since strings that aren't ISO dates don't sort chronologically
+    history = df[df['y'].notnull()]
+    history = history.assign(ds=pd.to_datetime(history['ds'])).sort_values('ds')
+    y = history['y'].to_numpy(dtype=np.float64)
+    signal = (y - y.mean()) / (y.std() or 1.0)
+    if penalty is None:
+        penalty = 15 * np.log(len(y))
+    
+    # Breakpoints are the indices where a new segment starts; the last one is always len(y)
+    breakpoints = ruptures.KernelCPD(kernel='linear').fit(signal).predict(pen=penalty)[:-1]
+    breakpoints = [i for i in breakpoints if i < changepoint_range * len(y)]
+    return history['ds'].iloc[breakpoints].reset_index(drop=True)
+
 # Function to add custom holidays
 def add_holidays_to_model(model, holidays_df):
     """
-    Add holidays to a Prophet model.
+    Add holiday-related components to a Prophet model.
+    
+    Country holidays are passed to the model when it is created (see the country
+    argument of create_prophet_model), so the holiday table is built once and
+    shared instead of being rebuilt on every fit.
     
     Parameters:
     - model: The Prophet model.
@@ -92,28 +342,403 @@ def add_holidays_to_model(model, holidays_df):
     Returns:
     - The Prophet model with holidays added.
     """
-    model.add_country_holidays(country_name='US')  # Example: US holidays, modify as per requirement
     model.add_seasonality(name='monthly', period=30.5, fourier_order=5)  # Example: monthly seasonality
     
     return model
 
 # Function to fit the model to data
-def fit_prophet_model(model, df):
+def fit_prophet_model(model, df, algorithm='LBFGS', iterations=10000):
     """
     Fit a Prophet model to data.
     
     Parameters:
     - model: The Prophet model.
     - df: DataFrame containing 'ds' (date) and 'y' (value) columns.
+    - algorithm: Stan optimizer for the MAP fit ('LBFGS', 'BFGS' or 'Newton').
+      Ignored when the model uses MCMC sampling.
+    - iterations: Maximum number of optimizer iterations.
     
     Returns:
     - The fitted Prophet model.
     """
-    model.fit(df)
+    import pandas as pd
+    
+    # Parse the dates and cast the values once, so Prophet never works on object columns
+    df = df.assign(ds=pd.to_datetime(df['ds'], cache=True), y=df['y'].astype(np.float64))
+    
+    if model.mcmc_samples > 0:
+        model.fit(df)
+    else:
+        model.fit(df, algorithm=algorithm, iter=iterations)
     return model
 
+# Seasonality feature builder installed on models fitted with fit_prophet_model_incremental
+def _incremental_seasonality_features(model, prev_X, dates, period, series_order, prefix):
+    """
+    Build Fourier features, computing only the rows not covered by a cached block.
+    
+    Parameters:
+    - model: The Prophet model, whose `_cached_seasonal` receives the fit-time blocks.
+    - prev_X: The `_cached_seasonal` attribute of a previously fitted model ({} if none).
+    - dates, period, series_order, prefix: As in Prophet.make_seasonality_features.
+    
+    Returns:
+    - A DataFrame with the Fourier features, like Prophet.make_seasonality_features.
+    """
+    import pandas as pd
+    
+    key = (prefix, period, series_order)
+    days = _dates_to_days(dates)
+    cached_days, cached_features = model._cached_seasonal.get(key) or prev_X.get(key, (None, None))
+    
+    n_cached = 0 if cached_days is None else len(cached_days)
+    if 0 < n_cached <= len(days) and np.array_equal(cached_days, days[:n_cached]):
+        new_features = _fourier_kernel(days[n_cached:], float(period), int(series_order))
+        features = np.vstack([cached_features, new_features])
+    else:
+        features = _fourier_kernel(days, float(period), int(series_order))
+    
+    # The first call comes from fit and covers exactly the training history
+    model._cached_seasonal.setdefault(key, (days, features))
+    
+    columns = ['{}_delim_{}'.format(prefix, i + 1) for i in range(features.shape[1])]
+    return pd.DataFrame(features.copy(), columns=columns)
+
+# Function to fit the model while reusing seasonal features from an earlier fit
+def fit_prophet_model_incremental(model, df, prev_X=None):
+    """
+    Fit a Prophet model, reusing the seasonal features computed by an earlier fit.
+    
+    Meant for walk-forward retraining, where each refit only appends rows to the
+    previous history: Fourier features are computed for the new rows only and
+    stacked onto the cached ones. The same cache also serves the history rows
+    when predicting with the fitted model.
+    
+    Parameters:
+    - model: The (unfitted) Prophet model, configured like the previous one.
+    - df: DataFrame containing 'ds' (date) and 'y' (value) columns.
+    - prev_X: The `_cached_seasonal` attribute of the previously fitted model, or None.
+    
+    Returns:
+    - The fitted Prophet model, with its own feature cache in `_cached_seasonal`.
+    """
+    model._cached_seasonal = {}
+    
+    # Shadow the classmethod on this instance only, with a module-level function so the model still pickles
+    model.make_seasonality_features = partial(_incremental_seasonality_features, model, prev_X or {})
+    model = fit_prophet_model(model, df)
+    model._cached_until = model.history['ds'].max()
+    
+    # Every block is in the model's own cache after fit, so stop holding on to the previous one
+    model.make_seasonality_features = partial(_incremental_seasonality_features, model, {})
+    return model
+
+# NumPy time units for the prediction frequencies that have a fixed step
+_FIXED_FREQ_UNITS = {'D': 'D', 'H': 'h', 'T': 'm', 'min': 'm', 'S': 's'}
+
+# Function to build the prediction dates without going through pandas
+def _future_dates(model, periods, freq):
+    """
+    Build the history and future dates used for prediction as a datetime64 array.
+    
+    Parameters:
+    - model: The fitted Prophet model.
+    - periods: Number of periods to predict into the future.
+    - freq: Frequency of the predictions.
+    
+    Returns:
+    - An array of history dates followed by the future dates, or None if freq has no fixed step.
+    """
+    unit = _FIXED_FREQ_UNITS.get(freq)
+    if unit is None:
+        return None
+    
+    last = model.history_dates.max().to_datetime64()
+    step = np.timedelta64(1, unit)
+    future = last + step * np.arange(1, periods + 1, dtype=np.int64)
+    return np.concatenate([model.history_dates.values, future])
+
+# Function to check whether a model can be predicted from NumPy arrays alone
+def _supports_array_predict(model):
+    """
+    Check that every model term can be evaluated from the dates alone.
+    
+    Parameters:
+    - model: The fitted Prophet model.
+    
+    Returns:
+    - True for linear or flat trends whose only features are unconditional seasonalities.
+    """
+    return (model.growth in ('linear', 'flat')
+            and not model.extra_regressors
+            and model.train_holiday_names is None
+            and all(props['condition_name'] is None for props in model.seasonalities.values()))
+
+# Function to convert prediction dates to model time
+def _prediction_times(model, dates):
+    """
+    Convert prediction dates to Prophet's scaled time and to days since the Unix epoch.
+    
+    Parameters:
+    - model: The fitted Prophet model.
+    - dates: datetime64 array of the dates to predict.
+    
+    Returns:
+    - A tuple (t, days) of float arrays.
+    """
+    nanoseconds = dates.astype('datetime64[ns]').astype(np.int64)
+    t = (nanoseconds - model.start.value) / model.t_scale.value
+    days = nanoseconds / (24 * 3600 * 1e9)
+    return t, days
+
+# Function to build the prediction inputs as arrays
+def _build_future_matrix(model, dates):
+    """
+    Build the scaled time and seasonal feature matrix for prediction without a DataFrame.
+    
+    Parameters:
+    - model: The fitted Prophet model.
+    - dates: datetime64 array of the dates to predict.
+    
+    Returns:
+    - A tuple (t, X) of scaled times and the feature matrix, with the columns in training order.
+    """
+    t, days = _prediction_times(model, dates)
+    
+    blocks = [_fourier_kernel(days, float(props['period']), int(props['fourier_order']))
+              for props in model.seasonalities.values()]
+    if not blocks:
+        # Prophet fits a single placeholder column of zeros when there are no seasonalities
+        blocks = [np.zeros((len(dates), 1))]
+    return t, np.hstack(blocks)
+
+# Factory for point-forecast kernels specialized to one model shape
+def _make_specialized_predictor(growth, n_changepoints, periods, orders):
+    """
+    Build a point-forecast kernel whose loop bounds are fixed for one model shape.
+    
+    The shape values are closure constants, so when the kernel is compiled with
+    Numba every loop has a compile-time trip count and can be fully unrolled.
+    
+    Parameters:
+    - growth: 'linear' or 'flat'.
+    - n_changepoints: Number of trend changepoints.
+    - periods: Tuple of seasonality periods in days, in training order.
+    - orders: Tuple of the matching Fourier orders.
+    
+    Returns:
+    - A function (t, days, k, m, deltas, changepoints_t, beta) -> (trend, seasonal) giving the
+      unscaled trend and each seasonality's contribution (one column per seasonality).
+    """
+    linear = growth == 'linear'
+    n_seasonalities = len(periods)
+    
+    def predict(t, days, k, m, deltas, changepoints_t, beta):
+        n = t.shape[0]
+        trend = np.empty(n)
+        seasonal = np.empty((n, n_seasonalities))
+        for row in range(n):
+            if linear:
+                rate = k
+                offset = m
+                for s in range(n_changepoints):
+                    if t[row] >= changepoints_t[s]:
+                        rate += deltas[s]
+                        offset -= changepoints_t[s] * deltas[s]
+                trend[row] = rate * t[row] + offset
+            else:
+                trend[row] = m
+            
+            col = 0
+            for j in range(n_seasonalities):
+                total = 0.0
+                for i in range(orders[j]):
+                    x = 2.0 * np.pi * (i + 1) * days[row] / periods[j]
+                    total += np.sin(x) * beta[col] + np.cos(x) * beta[col + 1]
+                    col += 2
+                seasonal[row, j] = total
+        return trend, seasonal
+    
+    return predict
+
+# Compiled point-forecast kernels, keyed by (growth, n_changepoints, periods, orders)
+_SPECIALIZED_PREDICTORS = {}
+
+# Function to get the compiled point-forecast kernel for a model's shape
+def _get_specialized_predictor(model):
+    """
+    Compile (once per model shape) and return the specialized point-forecast kernel.
+    
+    Deployments that forecast many series with the same hyperparameters compile
+    a kernel once and reuse it for every series.
+    
+    Parameters:
+    - model: The fitted Prophet model (see _supports_array_predict).
+    
+    Returns:
+    - The compiled kernel, or None if Numba is not installed or the model has no seasonalities.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    if not model.seasonalities:
+        return None
+    
+    periods = tuple(float(props['period']) for props in model.seasonalities.values())
+    orders = tuple(int(props['fourier_order']) for props in model.seasonalities.values())
+    key = (model.growth, len(model.changepoints_t), periods, orders)
+    if key not in _SPECIALIZED_PREDICTORS:
+        _SPECIALIZED_PREDICTORS[key] = njit(fastmath=True)(_make_specialized_predictor(*key))
+    return _SPECIALIZED_PREDICTORS[key]
+
+# Function to predict point forecasts from arrays
+def _predict_from_arrays(model, dates, specialized_predictor=False):
+    """
+    Compute the point forecast and its components directly with NumPy.
+    
+    Produces the same columns as model.predict without uncertainty intervals,
+    skipping Prophet's DataFrame setup and per-seasonality frame building.
+    
+    Parameters:
+    - model: The fitted Prophet model (see _supports_array_predict).
+    - dates: datetime64 array of the dates to predict.
+    - specialized_predictor: Use the kernel compiled for the model's shape (needs Numba),
+      which never materializes the feature matrix.
+    
+    Returns:
+    - A DataFrame with 'ds', 'trend', each component and 'yhat'.
+    """
+    import pandas as pd
+    
+    k = np.nanmean(model.params['k'])
+    m = np.nanmean(model.params['m'])
+    deltas = np.nanmean(model.params['delta'], axis=0)
+    beta = np.nanmean(model.params['beta'], axis=0)
+    component_cols = model.train_component_cols.values.astype(np.float64)
+    
+    predictor = _get_specialized_predictor(model) if specialized_predictor else None
+    if predictor is not None:
+        t, days = _prediction_times(model, dates)
+        trend, seasonal = predictor(t, days, k, m, deltas, model.changepoints_t, beta)
+        
+        # All columns of a seasonality belong to the same components, so use its first row
+        orders = [int(props['fourier_order']) for props in model.seasonalities.values()]
+        block_starts = np.cumsum([0] + [2 * order for order in orders])[:-1]
+        components = seasonal @ component_cols[block_starts]
+    else:
+        t, X = _build_future_matrix(model, dates)
+        if model.growth == 'linear':
+            trend = model.piecewise_linear(t, deltas, k, m, model.changepoints_t)
+        else:
+            trend = model.flat_trend(t, m)
+        components = X @ (beta[:, None] * component_cols)
+    
+    # Prophet's floor for non-logistic models: y_min with minmax scaling, 0 with absmax
+    floor = model.y_min if getattr(model, 'scaling', 'absmax') == 'minmax' else 0.0
+    forecast = {'ds': dates, 'trend': trend * model.y_scale + floor}
+    for i, component in enumerate(model.train_component_cols.columns):
+        values = components[:, i]
+        if component in model.component_modes['additive']:
+            values = values * model.y_scale
+        forecast[component] = values
+    
+    forecast = pd.DataFrame(forecast)
+    forecast['yhat'] = (forecast['trend'] * (1 + forecast['multiplicative_terms'])
+                        + forecast['additive_terms'])
+    return forecast
+
+# Prophet's own sample_posterior_predictive, kept for the models the vectorized version doesn't cover
+_PROPHET_SAMPLE_POSTERIOR_PREDICTIVE = None
+
+# Drop-in replacement for Prophet.sample_posterior_predictive
+def _sample_posterior_predictive(model, df, *args, **kwargs):
+    """
+    Simulate yhat and trend for every uncertainty sample at once.
+    
+    Follows Prophet's procedure (new changepoints from a Poisson process with
+    Laplace-distributed rate changes, plus observation noise) but draws all
+    samples with one numpy.random.Generator and evaluates them as array
+    operations instead of one Python iteration per sample. Logistic growth and
+    sampled regressor values fall back to Prophet's implementation.
+    
+    Parameters:
+    - model: The fitted Prophet model.
+    - df: Prediction DataFrame prepared by Prophet (with 't' and 'floor' columns).
+    - args, kwargs: Any further arguments of the installed Prophet version (such as
+      vectorized and regressor_samples), passed on when falling back.
+    
+    Returns:
+    - A dict with 'yhat' and 'trend' arrays of shape (len(df), number of samples).
+    """
+    regressor_samples = kwargs.get('regressor_samples', args[1] if len(args) > 1 else None)
+    if model.growth == 'logistic' or regressor_samples:
+        return _PROPHET_SAMPLE_POSTERIOR_PREDICTIVE(model, df, *args, **kwargs)
+    
+    # Seed from the global NumPy state so np.random.seed keeps forecasts reproducible
+    rng = np.random.default_rng(np.random.randint(2 ** 32, dtype=np.int64))
+    
+    n_iterations = model.params['k'].shape[0]
+    samp_per_iter = max(1, int(np.ceil(model.uncertainty_samples / float(n_iterations))))
+    iteration = np.repeat(np.arange(n_iterations), samp_per_iter)
+    n_samples = len(iteration)
+    
+    k = np.ravel(model.params['k'])
+    m = np.ravel(model.params['m'])
+    deltas = model.params['delta']
+    beta = model.params['beta']
+    sigma = np.ravel(model.params['sigma_obs'])
+    t = np.array(df['t'])
+    
+    # Trend of each posterior iteration through the fitted changepoints
+    if model.growth == 'linear':
+        A = (t[:, None] >= model.changepoints_t[None, :]).astype(np.float64)
+        k_t = k[:, None] + deltas @ A.T
+        m_t = m[:, None] + (-model.changepoints_t * deltas) @ A.T
+        trend = (k_t * t + m_t)[iteration]
+    else:
+        trend = np.repeat(m[iteration, None], len(t), axis=1)
+    
+    # New changepoints in the forecast period, each bending its sample's trend by delta * (t - t_s)
+    T = t.max()
+    if model.growth == 'linear' and T > 1:
+        S = len(model.changepoints_t)
+        n_changes = rng.poisson(S * (T - 1), size=n_samples)
+        owner = np.repeat(np.arange(n_samples), n_changes)
+        if len(owner) > 0:
+            changepoint_ts_new = 1 + rng.random(len(owner)) * (T - 1)
+            lambda_ = np.mean(np.abs(deltas), axis=1) + 1e-8
+            deltas_new = rng.laplace(0, lambda_[iteration[owner]])
+            
+            # At time t the bends add up to t * D(t) - G(t), where D and G sum delta and
+            # delta * t_s over the sample's changepoints before t. Scatter each changepoint
+            # into the first future step after it and accumulate along time.
+            future = np.nonzero(t > 1)[0]
+            future = future[np.argsort(t[future], kind='stable')]
+            t_future = t[future]
+            n_future = len(future) + 1  # Changepoints after the last step land in a spare column
+            cells = owner * n_future + np.searchsorted(t_future, changepoint_ts_new, side='right')
+            D = np.bincount(cells, weights=deltas_new, minlength=n_samples * n_future)
+            G = np.bincount(cells, weights=deltas_new * changepoint_ts_new,
+                            minlength=n_samples * n_future)
+            D = np.cumsum(D.reshape(n_samples, n_future)[:, :-1], axis=1)
+            G = np.cumsum(G.reshape(n_samples, n_future)[:, :-1], axis=1)
+            trend[:, future] += t_future * D - G
+    
+    trend = trend * model.y_scale + np.array(df['floor'])
+    
+    seasonal_features, _, component_cols, _ = model.make_all_seasonality_features(df)
+    X = seasonal_features.values
+    Xb_a = (beta * component_cols['additive_terms'].values) @ X.T * model.y_scale
+    Xb_m = (beta * component_cols['multiplicative_terms'].values) @ X.T
+    noise = rng.normal(0, sigma[iteration, None], size=trend.shape) * model.y_scale
+    
+    yhat = trend * (1 + Xb_m[iteration]) + Xb_a[iteration] + noise
+    return {'yhat': yhat.T, 'trend': trend.T}
+
 # Function to make future predictions
-def make_future_predictions(model, periods, freq='D'):
+def make_future_predictions(model, periods, freq='D', uncertainty=True, uncertainty_samples=None,
+                            specialized_predictor=False):
     """
     Make future predictions using a fitted Prophet model.
     
@@ -121,12 +746,40 @@ def make_future_predictions(model, periods, freq='D'):
     - model: The fitted Prophet model.
     - periods: Number of periods to predict into the future.
     - freq: Frequency of the predictions (default is daily).
+    - uncertainty: Whether to compute uncertainty intervals. When False, only the
+      point forecast (yhat and its components) is returned and sampling is skipped.
+    - uncertainty_samples: Number of simulated draws used to estimate the intervals
+      (default is the model's own setting). The model is left unchanged afterwards.
+    - specialized_predictor: For point forecasts, compile a kernel specialized to the model's
+      shape (needs Numba). Compiling takes about half a second per shape and process and
+      saves well under a millisecond per call, so only enable it when the same process
+      predicts many models of one shape.
     
     Returns:
     - A DataFrame containing future predictions.
     """
-    future = model.make_future_dataframe(periods=periods, freq=freq)
-    forecast = model.predict(future)
+    import pandas as pd
+    
+    dates = _future_dates(model, periods, freq)
+    
+    # Point forecasts of plain trend + seasonality models don't need Prophet's DataFrame path
+    if not uncertainty and dates is not None and _supports_array_predict(model):
+        return _predict_from_arrays(model, dates, specialized_predictor)
+    
+    if dates is None:
+        future = model.make_future_dataframe(periods=periods, freq=freq)
+    else:
+        future = pd.DataFrame({'ds': dates})
+    
+    original_samples = model.uncertainty_samples
+    if not uncertainty:
+        model.uncertainty_samples = 0
+    elif uncertainty_samples is not None:
+        model.uncertainty_samples = uncertainty_samples
+    try:
+        forecast = model.predict(future)
+    finally:
+        model.uncertainty_samples = original_samples
     return forecast
 
 # Function to plot forecast results
@@ -147,7 +800,9 @@ def plot_forecast(model, forecast):
 # Example function to run the entire forecasting process
 def run_forecasting_pipeline(data, growth='linear', changepoint_range=0.8, yearly_seasonality='auto', 
                              weekly_seasonality='auto', daily_seasonality=False, seasonality_mode='additive',
-                             n_changepoints=25, periods=365, freq='D', holidays_df=None):
+                             n_changepoints=25, periods=365, freq='D', holidays_df=None, mcmc_samples=0,
+                             algorithm='LBFGS', uncertainty=True, plot=False, pelt_changepoints=False,
+                             stan_backend='GLM', specialized_predictor=False):
     """
     Run the complete Prophet forecasting pipeline.
     
@@ -163,27 +818,113 @@ def run_forecasting_pipeline(data, growth='linear', changepoint_range=0.8, yearl
     - periods: Number of future periods to predict.
     - freq: Frequency of predictions (e.g., 'D' for daily).
     - holidays_df: Optional DataFrame with holiday data.
+    - mcmc_samples: Number of MCMC samples (0 uses MAP estimation).
+    - algorithm: Stan optimizer for the MAP fit (default is L-BFGS).
+    - uncertainty: Whether to compute uncertainty intervals (False returns only the point forecast).
+    - plot: Whether to plot the forecast (default is False, so no matplotlib figure is built).
+    - pelt_changepoints: Use changepoints detected with PELT instead of n_changepoints uniform candidates.
+    - stan_backend: Stan backend for the model ('GLM' for the forked model, see create_prophet_model).
+    - specialized_predictor: Compile the point-forecast kernel for the model's shape (see
+      make_future_predictions); worth it when one process forecasts many series of one shape.
     
     Returns:
     - Forecasted results as a DataFrame.
     """
-    # Step 1: Create and configure the model
+    import pandas as pd
+    
+    # Step 1: Create and configure the model, with US holidays covering history and horizon
+    country, holiday_years = None, None
+    if holidays_df is not None:
+        ds = pd.to_datetime(data['ds'])
+        last_date = ds.max() + pd.tseries.frequencies.to_offset(freq) * periods
+        country = 'US'  # Example: US holidays, modify as per requirement
+        holiday_years = range(ds.min().year, last_date.year + 1)
+    
+    changepoints = None
+    if pelt_changepoints:
+        changepoints = detect_changepoints(data, changepoint_range)
+    
     model = create_prophet_model(growth, changepoint_range, yearly_seasonality, 
                                  weekly_seasonality, daily_seasonality, 
-                                 seasonality_mode, n_changepoints)
+                                 seasonality_mode, n_changepoints, mcmc_samples,
+                                 country, holiday_years, changepoints, stan_backend)
     
     # Step 2: Add holidays if provided
     if holidays_df is not None:
         model = add_holidays_to_model(model, holidays_df)
     
     # Step 3: Fit the model to historical data
-    model = fit_prophet_model(model, data)
+    model = fit_prophet_model(model, data, algorithm)
     
     # Step 4: Make future predictions
-    forecast = make_future_predictions(model, periods, freq)
+    forecast = make_future_predictions(model, periods, freq, uncertainty,
+                                       specialized_predictor=specialized_predictor)
     
     # Step 5: Plot the forecast
-    plot_forecast(model, forecast)
+    if plot:
+        plot_forecast(model, forecast)
     
     return forecast
 
+# Worker process initializer for batch forecasting
+def _init_worker(stan_threads):
+    """
+    Set the worker's Stan thread budget and load the Stan model once, before its first fit.
+    
+    Parameters:
+    - stan_threads: Threads each Stan run in this worker may use.
+    """
+    os.environ['STAN_NUM_THREADS'] = str(stan_threads)
+    _get_stan_backend()
+
+# Function to forecast one series inside a worker process
+def _fit_one(args):
+    """
+    Run the forecasting pipeline for a single series without plotting.
+    
+    Parameters:
+    - args: Tuple of (series key, DataFrame with 'ds' and 'y', pipeline keyword arguments).
+    
+    Returns:
+    - A tuple of (series key, forecast DataFrame).
+    """
+    key, data, pipeline_kwargs = args
+    forecast = run_forecasting_pipeline(data, plot=False, **pipeline_kwargs)
+    return key, forecast
+
+# Function to run the forecasting pipeline over many series in parallel
+def run_forecasting_pipeline_batch(data_by_series, max_workers=None, **pipeline_kwargs):
+    """
+    Run the Prophet forecasting pipeline for many series, one worker process per CPU core.
+    
+    Parameters:
+    - data_by_series: Dict mapping a series key to its DataFrame with 'ds' (date) and 'y' (value).
+    - max_workers: Number of worker processes (default is the number of CPU cores).
+    - pipeline_kwargs: Arguments passed to run_forecasting_pipeline for every series.
+      Plotting is not done in the workers; plot the returned forecasts instead.
+      With specialized_predictor=True, each worker compiles the point-forecast kernel once
+      per model shape and reuses it for the rest of its series.
+    
+    Returns:
+    - A dict mapping each series key to its forecasted results.
+    """
+    pipeline_kwargs.pop('plot', None)
+    max_workers = min(max_workers or os.cpu_count(), max(len(data_by_series), 1))
+    
+    # Compile the Stan model up front so the workers don't race to build it
+    _get_stan_backend()
+    
+    # Share the cores between the workers instead of giving each one every core
+    stan_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    
+    forecasts = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(stan_threads,)) as executor:
+        futures = [executor.submit(_fit_one, (key, data, pipeline_kwargs))
+                   for key, data in data_by_series.items()]
+        for future in as_completed(futures):
+            key, forecast = future.result()
+            forecasts[key] = forecast
+    
+    return {key: forecasts[key] for key in data_by_series}
+
@@ -0,0 +1,106 @@
+# Stan backend used by Resources.py to fit Prophet with the forked Stan model in stan/
+import os
+
+import numpy as np
+import prophet
+from prophet.models import CmdStanPyBackend, IStanBackend
+
+# Path to the forked Prophet Stan model
+STAN_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stan', 'prophet.stan')
+
+# Warmup iterations, as a fraction of samples, used when a fit is warm-started from a
+# previous adaptation (a cold start warms up for half of the samples)
+WARM_START_WARMUP_FRACTION = 0.25
+
+# Adapted NUTS step size and inverse metric, keyed by the model's parameter dimensions
+_WARM_STARTS = {}
+
+
+class GLMStanBackend(CmdStanPyBackend):
+    """
+    CmdStanPy backend that fits Prophet with the model in stan/prophet.stan.
+    
+    The forked model evaluates the likelihood with Stan's fused normal_id_glm
+    kernel. It is compiled on first use with the user's CmdStan installation;
+    CmdStanPy reuses the executable on later runs as long as it is newer than
+    the Stan source.
+    
+    MCMC fits are warm-started: the step size and inverse metric adapted by the
+    first fit of a given shape are the starting values for later fits of the
+    same shape. Those fits still adapt to their own series, but with a shorter
+    warmup.
+    
+    STAN_NUM_THREADS is treated as the thread budget of one fit: MCMC runs at
+    most that many chains in parallel and gives each the remaining threads.
+    """
+
+    def __init__(self):
+        # Skip CmdStanPyBackend.__init__, which points CmdStanPy at Prophet's bundled CmdStan
+        import cmdstanpy
+        cmdstanpy.set_cmdstan_path(_cmdstan_path())
+        IStanBackend.__init__(self)
+
+    def load_model(self):
+        import cmdstanpy
+        return cmdstanpy.CmdStanModel(stan_file=STAN_MODEL_FILE)
+
+    def sampling(self, stan_init, stan_data, samples, **kwargs):
+        # Step size and metric are only transferable between fits with the same parameters
+        key = (stan_data['K'], stan_data['S'], stan_data['trend_indicator'])
+        warm_start = _WARM_STARTS.get(key)
+        user_tuned = 'step_size' in kwargs or 'metric' in kwargs
+        
+        if warm_start is not None and not user_tuned:
+            kwargs['step_size'] = warm_start['step_size']
+            kwargs['metric'] = {'inv_metric': warm_start['inv_metric']}
+            kwargs.setdefault('iter_warmup', max(1, int(samples * WARM_START_WARMUP_FRACTION)))
+        
+        # CmdStanPy overwrites STAN_NUM_THREADS with parallel_chains * threads_per_chain,
+        # so split the thread budget between the chains and restore it afterwards
+        stan_threads = os.environ.get('STAN_NUM_THREADS', '1')
+        kwargs.setdefault('parallel_chains', max(1, min(kwargs.get('chains', 4), int(stan_threads))))
+        kwargs.setdefault('threads_per_chain', max(1, int(stan_threads) // kwargs['parallel_chains']))
+        try:
+            params = super().sampling(stan_init, stan_data, samples, **kwargs)
+        finally:
+            os.environ['STAN_NUM_THREADS'] = stan_threads
+        
+        if warm_start is None and not user_tuned:
+            _WARM_STARTS[key] = _save_adaptation(self.stan_fit)
+        return params
+
+
+def _cmdstan_path():
+    """
+    Find the CmdStan installation to compile the forked model with.
+    
+    The CmdStan bundled with prophet can run the packaged model but has no
+    sources to build another one, so it is never used here.
+    
+    Returns:
+    - The CMDSTAN path, or else the latest CmdStan installed in ~/.cmdstan.
+    """
+    import cmdstanpy
+    bundled = os.path.join(os.path.dirname(os.path.abspath(prophet.__file__)), 'stan_model')
+    path = os.environ.get('CMDSTAN')
+    if path and not os.path.abspath(path).startswith(bundled):
+        return path
+    
+    # Without CMDSTAN, CmdStanPy looks in ~/.cmdstan (and raises ValueError if there is none)
+    os.environ.pop('CMDSTAN', None)
+    return cmdstanpy.cmdstan_path()
+
+
+def _save_adaptation(stan_fit):
+    """
+    Average the adapted step size and inverse metric over chains.
+    
+    Parameters:
+    - stan_fit: The CmdStanMCMC fit returned by the sampler.
+    
+    Returns:
+    - A dict with the mean 'step_size' and the mean 'inv_metric' as a list, in the form
+      CmdStanPy accepts for its step_size and metric arguments.
+    """
+    inv_metric = np.mean(stan_fit.inv_metric, axis=0)
+    return {'step_size': float(np.mean(stan_fit.step_size)), 'inv_metric': inv_metric.tolist()}